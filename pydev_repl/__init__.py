@@ -1,14 +1,39 @@
 # pydev_repl/__init__.py
-from importlib.metadata import version, PackageNotFoundError
+import importlib
 
-try:
-  __version__ = version(__name__)
-except PackageNotFoundError:
-  __version__ = '0.0.0.dev0'
+__all__ = ['run', 'globals_of', 'Config', 'affected_snippet', 'watch_files', 'parse_argv']
 
-from .context import run, globals_of, Config
-from .parse import affected_snippet
-from .dev_watchdog import watch_files
-from .dev_argparse import parse_argv
+# PEP 562 lazy re-exports: attribute → defining submodule.  Importing the
+# package stays cheap; e.g. parse_argv users never pay for watchdog's
+# platform-observer setup.
+_LAZY = {
+  'run': '.context',
+  'globals_of': '.context',
+  'Config': '.context',
+  'affected_snippet': '.parse',
+  'watch_files': '.dev_watchdog',
+  'parse_argv': '.dev_argparse',
+}
 
-__all__ = ['run', 'globals_of', 'Config', 'affected_snippet', 'watch_files', 'parse_argv']
+
+def __getattr__(name: str):
+  target = _LAZY.get(name)
+  if target is not None:
+    value = getattr(importlib.import_module(target, __name__), name)
+    globals()[name] = value          # cache: next access skips __getattr__
+    return value
+  # resolve __version__ only when asked — the metadata lookup walks the
+  # installed-distributions dir on every import otherwise
+  if name == '__version__':
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+      v = version(__name__)
+    except PackageNotFoundError:
+      v = '0.0.0.dev0'
+    globals()['__version__'] = v
+    return v
+  raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+  return sorted(set(globals()) | set(__all__))
@@ -13,12 +13,15 @@ Returns the context-key.
 
 from __future__ import annotations
 
+import functools
 import importlib
+import itertools
+import os
+import re
 # import sys
-import uuid
 from pathlib import Path
-from types import ModuleType
-from typing import Dict, List
+from types import CodeType, ModuleType
+from typing import Dict, Iterable, List
 import ast
 
 from .parse import affected_snippet
@@ -42,36 +45,70 @@ class Config:
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# Internal cache: key → {'globals', 'src', 'cfg'}
+# Internal cache: key → _Ctx
 # ─────────────────────────────────────────────────────────────────────────────
-_CTX: Dict[str, Dict[str, object]] = {}
+class _Ctx:
+  __slots__ = ('globals', 'chunks', 'cfg', 'mod_mtimes', 'module_names')
+
+  def __init__(self, globals: Dict[str, object], src: str, cfg: Config) -> None:
+    self.globals = globals
+    self.chunks: List[str] = [src]   # initial source + applied patches
+    self.cfg = cfg
+    self.mod_mtimes: Dict[str, float] = {}   # global name → __file__ mtime
+    # names known to hold modules; keeps the reload sweep O(#modules)
+    self.module_names: set[str] = {
+      name for name, obj in globals.items() if isinstance(obj, ModuleType)
+    }
+
+  @property
+  def src(self) -> str:
+    '''Full accumulated source; joined on demand.'''
+    return ''.join(self.chunks)
+
+  def append_patch(self, patch: str) -> None:
+    # amortized O(1) vs O(len(src)) string concatenation per patch
+    self.chunks.append('\n' + patch)
+
+
+_CTX: Dict[str, _Ctx] = {}
+
+
+# Characters that rule out *ctx_or_src* being a file path (single C-level scan)
+_BAD_PATH_CHARS = re.compile(r'[:*\n\t]')
+
+_next_key_id = itertools.count()
 
 
 def _new_key() -> str:
-  return uuid.uuid4().hex
+  # Keys only identify contexts inside this process; a counter beats the
+  # getrandom() syscall uuid4 pays per call.
+  return f'ctx_{next(_next_key_id):016x}'
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Execution helpers
 # ─────────────────────────────────────────────────────────────────────────────
-def _should_run_line(line: str, cfg: Config) -> bool:
-  '''Decide if a single top-level line should execute under *cfg*.'''
-  import ast
-  stripped = line.strip()
-  if not stripped:
-    return False
-  node = ast.parse(line).body[0]
-  if isinstance(node, (ast.Import, ast.ImportFrom)):
-    return cfg.execute_imports
-  if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-    return cfg.define_functions
-  return cfg.run_code
-
-
-def _exec(src: str, g: Dict[str, object], cfg: Config) -> None:
+@functools.lru_cache(maxsize=256)
+def _compile(src: str, fname: str) -> CodeType:
+  '''Compile *src* once per (src, fname); identical snippets skip the parser.'''
+  return compile(src, fname, 'exec')
+
+
+@functools.lru_cache(maxsize=32)
+def _parse(src: str) -> ast.Module:
+  '''Parse *src* once; re-running the same source skips the AST front-end.'''
+  return ast.parse(src)
+
+
+def _exec(
+  src: str,
+  g: Dict[str, object],
+  cfg: Config,
+  ctx: _Ctx | None = None,
+) -> None:
   '''Plain exec with caller-supplied globals; no I/O redirection.'''
   if not src.strip():
-    return 
+    return
 
   # pre_mods = {name: mod for name, mod in g.items() if isinstance(mod, ModuleType)}
   # if pre_mods:
@@ -80,13 +117,39 @@ def _exec(src: str, g: Dict[str, object], cfg: Config) -> None:
   #     src_prefix += f'importlib.reload({mod_name})\n'
   #   src = f'{src_prefix}\n{src}'
   if cfg.reload_modules:
-    for name, obj in g.items():
-      if isinstance(obj, ModuleType):
-        g[name] = importlib.reload(obj)
-
-  code = compile(src, g.get('__file__', '<string>'), 'exec')
+    mtimes = ctx.mod_mtimes if ctx is not None else None
+    if ctx is not None:
+      names: 'Iterable[str]' = tuple(ctx.module_names)
+    else:
+      names = tuple(name for name, obj in g.items() if isinstance(obj, ModuleType))
+    for name in names:
+      obj = g.get(name)
+      if not isinstance(obj, ModuleType):
+        if ctx is not None:
+          ctx.module_names.discard(name)   # rebound to a non-module
+        continue
+      fname = getattr(obj, '__file__', None)
+      if fname is None:
+        continue                     # built-in/frozen — nothing on disk
+      try:
+        mtime = os.stat(fname).st_mtime
+      except OSError:
+        mtime = None
+      if mtimes is not None and mtime is not None and mtimes.get(name) == mtime:
+        continue                     # unchanged on disk → skip reload
+      g[name] = importlib.reload(obj)
+      if mtimes is not None and mtime is not None:
+        mtimes[name] = mtime
+
+  code = _compile(src, g.get('__file__', '<string>'))
   exec(code, g, g)
 
+  if ctx is not None:
+    # refresh the module-name cache from the names this code touched
+    for name in code.co_names:
+      if isinstance(g.get(name), ModuleType):
+        ctx.module_names.add(name)
+
 # def _exec(src: str, g: Dict[str, object], cfg: Config) -> None:
 #   '''Plain exec with caller-supplied globals; no I/O redirection.'''
 #   if not src.strip():
@@ -124,9 +187,8 @@ def _execute_fresh(src: str, cfg: Config) -> Dict[str, object]:
     return g
 
   # Build snippet containing only allowed statements
-  lines = src.splitlines(keepends=True)
-  module = ast.parse(src)
-  selected_chunks: list[str] = []
+  module = _parse(src)
+  ranges: list[tuple[int, int]] = []
 
   for node in module.body:
     keep = False
@@ -138,11 +200,18 @@ def _execute_fresh(src: str, cfg: Config) -> Dict[str, object]:
       keep = cfg.run_code
 
     if keep:
-      start = node.lineno - 1
-      end = getattr(node, 'end_lineno', node.lineno) - 1
-      selected_chunks.append(''.join(lines[start : end + 1]))
+      ranges.append((node.lineno - 1, getattr(node, 'end_lineno', node.lineno) - 1))
+
+  # Merge adjacent/overlapping ranges, then join the kept lines exactly once
+  merged: list[tuple[int, int]] = []
+  for start, end in ranges:
+    if merged and start <= merged[-1][1] + 1:
+      merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+    else:
+      merged.append((start, end))
 
-  _exec(''.join(selected_chunks), g, cfg)
+  lines = src.splitlines(keepends=True)
+  _exec(''.join(itertools.chain.from_iterable(lines[s : e + 1] for s, e in merged)), g, cfg)
   return g
 
 
@@ -160,32 +229,30 @@ def run(ctx_or_src: str, patch: str | None = None, cfg: Config | None = None) ->
     key = ctx_or_src
     ctx = _CTX[key]
     if patch:
-      _exec(patch, ctx['globals'], ctx['cfg'])
-      ctx['src'] += '\n' + patch
+      _exec(patch, ctx.globals, ctx.cfg, ctx)
+      ctx.append_patch(patch)
     return key
 
   # --- new context ----------------------------------------------------------
-  src_path = Path(ctx_or_src)
-  try:
-    is_path = (
-          len(ctx_or_src) < 4096
-      and not any(c in ctx_or_src for c in ':*\n\t')
-      and src_path.exists()
-      and src_path.is_file()
-    )
-  except:
-    is_path = False
+  # Cheap in-string checks first; only stat when plausibly a path
+  is_path = len(ctx_or_src) < 4096 and _BAD_PATH_CHARS.search(ctx_or_src) is None
+  if is_path:
+    src_path = Path(ctx_or_src)
+    try:
+      is_path = src_path.exists() and src_path.is_file()
+    except:
+      is_path = False
   src_text = src_path.read_text(encoding='utf-8') if is_path else ctx_or_src
 
   cfg = cfg or Config()
   g = _execute_fresh(src_text, cfg)
 
   key = _new_key()
-  _CTX[key] = {'globals': g, 'src': src_text, 'cfg': cfg}
+  ctx = _CTX[key] = _Ctx(g, src_text, cfg)
 
   if patch:
-    _exec(patch, g, cfg)
-    _CTX[key]['src'] += '\n' + patch
+    _exec(patch, g, cfg, ctx)
+    ctx.append_patch(patch)
 
   return key
 
@@ -194,4 +261,4 @@ def run(ctx_or_src: str, patch: str | None = None, cfg: Config | None = None) ->
 # Convenience accessor
 # ─────────────────────────────────────────────────────────────────────────────
 def globals_of(key: str) -> Dict[str, object]:
-  return _CTX[key]['globals'].copy()
+  return _CTX[key].globals.copy()
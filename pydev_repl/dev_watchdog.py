@@ -17,7 +17,7 @@ Returns:
 
 from __future__ import annotations
 
-import time
+import threading
 from pathlib import Path
 from typing import Callable, Iterable, Set
 
@@ -29,11 +29,18 @@ class _ChangeHandler(FileSystemEventHandler):
   def __init__(self, watched: Set[Path], callback: Callable[[Set[Path]], None]) -> None:
     super().__init__()
     self._files = watched
+    # resolved paths as plain strings: membership test without a resolve()
+    self._files_str = frozenset(str(p) for p in watched)
     self._cb = callback
 
   # “modified” also fires on create/overwrite for most editors
   def on_modified(self, event: FileModifiedEvent):  # type: ignore[override]
-    p = Path(event.src_path).resolve()
+    if event.is_directory:
+      return
+    if event.src_path in self._files_str:   # fast path: no syscall
+      self._cb({Path(event.src_path)})
+      return
+    p = Path(event.src_path).resolve()      # e.g. event came via a symlink
     if p in self._files:          # ignore temp files etc.
       self._cb({p})
 
@@ -46,32 +53,59 @@ def watch_files(
   debounce_sec: float = 0.05,   # collapse rapid bursts
 ) -> Callable[[], None]:
   paths = {Path(p).resolve() for p in paths}
-  handler = _ChangeHandler(paths, _debounced(on_change, debounce_sec))
+  debounced = _debounced(on_change, debounce_sec)
+  handler = _ChangeHandler(paths, debounced)
 
   observer = Observer()
-  for p in paths:
-    observer.schedule(handler, str(p.parent), recursive=recursive)
+  # one watch per distinct parent dir — duplicates would multiply events
+  for d in {p.parent for p in paths}:
+    observer.schedule(handler, str(d), recursive=recursive)
   observer.start()
 
   def stop() -> None:
     observer.stop()
     observer.join()
+    debounced.cancel()
 
   return stop
 
 
 # ---------- utility: simple debounce ----------------------------------------
 def _debounced(fn: Callable[[Set[Path]], None], wait: float):
-  last_call: list[float] = [0.0]
+  '''Trailing-edge debounce: fire *wait* seconds after the last event.
+
+  The previous leading-edge variant compared ``time.time()`` stamps and
+  silently dropped trailing events inside the window; a (monotonic) Timer
+  guarantees every burst ends in exactly one callback.
+  '''
+  lock = threading.Lock()
   pending: Set[Path] = set()
+  timer: list[threading.Timer | None] = [None]
 
-  def _wrapped(files: Set[Path]) -> None:
+  def _flush() -> None:
     nonlocal pending
-    pending |= files
-    now = time.time()
-    if now - last_call[0] > wait:
-      last_call[0] = now
+    with lock:
       to_send, pending = pending, set()
+      timer[0] = None
+    if to_send:
       fn(to_send)
 
+  def _wrapped(files: Set[Path]) -> None:
+    nonlocal pending
+    with lock:
+      pending |= files
+      if timer[0] is not None:
+        timer[0].cancel()
+      t = threading.Timer(wait, _flush)
+      t.daemon = True
+      timer[0] = t
+      t.start()
+
+  def _cancel() -> None:
+    with lock:
+      if timer[0] is not None:
+        timer[0].cancel()
+        timer[0] = None
+
+  _wrapped.cancel = _cancel   # type: ignore[attr-defined]
   return _wrapped
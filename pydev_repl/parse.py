@@ -8,8 +8,10 @@ from __future__ import annotations
 
 import ast
 import difflib
-from dataclasses import dataclass
-from typing import List, Set
+import hashlib
+import sys
+from collections import OrderedDict, deque
+from typing import FrozenSet, List, NamedTuple, Set, Tuple
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -26,31 +28,39 @@ def _is_comment_or_blank(line: str) -> bool:
 # ─────────────────────────────────────────────────────────────────────────────
 # 1.  Static-analysis helpers
 # ─────────────────────────────────────────────────────────────────────────────
-@dataclass
-class _Stmt:
+class _Stmt(NamedTuple):
   idx: int
   start: int
   end: int
   src: str
-  provides: Set[str]
-  depends: Set[str]
+  provides: FrozenSet[str]
+  depends: FrozenSet[str]
   is_def: bool
 
 
-class _LoadNameFinder(ast.NodeVisitor):
-  '''Collect *load-context* names at top level (skip nested defs).'''
+_SCOPE_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
 
-  def __init__(self) -> None:
-    self.names: Set[str] = set()
 
-  def visit_FunctionDef(self, node: ast.FunctionDef) -> None:     # noqa
-    pass  # skip inner scope
+def _collect_load_names(node: ast.AST) -> Set[str]:
+  '''Collect *load-context* names at top level (skip nested defs).
 
-  visit_AsyncFunctionDef = visit_ClassDef = visit_FunctionDef
-
-  def visit_Name(self, node: ast.Name) -> None:                   # type: ignore[override]
-    if isinstance(node.ctx, ast.Load):
-      self.names.add(node.id)
+  Manual stack walk instead of a NodeVisitor: no per-node method dispatch.
+  '''
+  names: Set[str] = set()
+  stack = [node]
+  pop = stack.pop
+  extend = stack.extend
+  while stack:
+    n = pop()
+    t = type(n)
+    if t is ast.Name:
+      if isinstance(n.ctx, ast.Load):
+        names.add(n.id)
+      continue
+    if t in _SCOPE_NODES:
+      continue                      # skip inner scope
+    extend(ast.iter_child_nodes(n))
+  return names
 
 
 def _collect_target_names(target) -> Set[str]:
@@ -65,12 +75,19 @@ def _collect_target_names(target) -> Set[str]:
 
 
 def _scan(lines: List[str]) -> List[_Stmt]:
-  mod = ast.parse(''.join(lines))
+  src_text = ''.join(lines)
+  mod = ast.parse(src_text)
   stmts: List[_Stmt] = []
 
+  # Cumulative character offsets: stmt i's source is one slice of src_text
+  # instead of a per-stmt list slice + join.
+  offsets = [0]
+  for line in lines:
+    offsets.append(offsets[-1] + len(line))
+
   for i, node in enumerate(mod.body):
     s, e = node.lineno - 1, getattr(node, 'end_lineno', node.lineno) - 1
-    is_def = isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    is_def = isinstance(node, _SCOPE_NODES)
 
     # —— symbols provided ——————————————————————————————————————— #
     provides: Set[str] = set()
@@ -88,9 +105,7 @@ def _scan(lines: List[str]) -> List[_Stmt]:
     # —— dependencies (load context + aug-assign targets) ———————— #
     depends: Set[str] = set()
     if not (is_def or isinstance(node, (ast.Import, ast.ImportFrom))):
-      finder = _LoadNameFinder()
-      finder.visit(node)
-      depends |= finder.names
+      depends |= _collect_load_names(node)
       if isinstance(node, ast.AugAssign):
         # target is read as well as written
         depends |= _collect_target_names(node.target)
@@ -100,15 +115,43 @@ def _scan(lines: List[str]) -> List[_Stmt]:
         idx=i,
         start=s,
         end=e,
-        src=''.join(lines[s : e + 1]),
-        provides=provides,
-        depends=depends,
+        src=src_text[offsets[s] : offsets[e + 1]],
+        # interned: identical identifiers share one object, so the set ops
+        # in affected_snippet hit the identity shortcut before __eq__
+        provides=frozenset(map(sys.intern, provides)),
+        depends=frozenset(map(sys.intern, depends)),
         is_def=is_def,
       )
     )
   return stmts
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# 1b.  Scan cache — in a watch loop the previous new_src is the next old_src
+# ─────────────────────────────────────────────────────────────────────────────
+_SCAN_CACHE: 'OrderedDict[bytes, Tuple[List[str], List[_Stmt]]]' = OrderedDict()
+_SCAN_CACHE_MAX = 64
+
+
+def _src_key(src: str) -> bytes:
+  return hashlib.blake2b(src.encode(), digest_size=16).digest()
+
+
+def _scan_cached(src: str) -> Tuple[List[str], List[_Stmt]]:
+  '''Split + scan *src*, memoised on a content hash (LRU-bounded).'''
+  key = _src_key(src)
+  hit = _SCAN_CACHE.get(key)
+  if hit is not None:
+    _SCAN_CACHE.move_to_end(key)
+    return hit
+  lines = src.splitlines(keepends=True)
+  entry = (lines, _scan(lines))
+  _SCAN_CACHE[key] = entry
+  if len(_SCAN_CACHE) > _SCAN_CACHE_MAX:
+    _SCAN_CACHE.popitem(last=False)
+  return entry
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 2.  Public API
 # ─────────────────────────────────────────────────────────────────────────────
@@ -121,56 +164,57 @@ def affected_snippet(old_src: str, new_src: str) -> str:
   old_src = _sanitise(old_src)
   new_src = _sanitise(new_src)
 
-  old_lines = old_src.splitlines(keepends=True)
-  new_lines = new_src.splitlines(keepends=True)
+  # Old side only needs its lines — reuse a cached scan when present but
+  # never force one (old_src may predate the last parseable state).
+  old_hit = _SCAN_CACHE.get(_src_key(old_src))
+  old_lines = old_hit[0] if old_hit is not None else old_src.splitlines(keepends=True)
+  new_lines, stmts = _scan_cached(new_src)
 
   # —— 1. diff → line numbers changed in *new* ——————————————— #
   changed_lines: Set[int] = set()
-  lo = ln = 0
-  for d in difflib.ndiff(old_lines, new_lines):
-    tag = d[:2]
-    if tag == '  ':
-      lo += 1
-      ln += 1
-    elif tag == '- ':
-      lo += 1
-    elif tag == '+ ':
-      # Only count as change if the *added* line isn't comment/blank
-      if not _is_comment_or_blank(new_lines[ln]):
-        changed_lines.add(ln)
-      ln += 1
-
-  stmts = _scan(new_lines)
+  sm = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+  for tag, _i1, _i2, j1, j2 in sm.get_opcodes():
+    if tag in ('replace', 'insert'):
+      # Only count added lines that aren't comment/blank
+      changed_lines.update(
+        j for j in range(j1, j2) if not _is_comment_or_blank(new_lines[j])
+      )
 
   # —— 2. seed dirty sets ———————————————————————————————— #
   direct_dirty_ids = {
     s.idx for s in stmts if any(s.start <= ln <= s.end for ln in changed_lines)
   }
   dirty_ids = set(direct_dirty_ids)
-  dirty_syms = {sym for s in stmts if s.idx in dirty_ids for sym in s.provides}
-
-  # —— 3. dependency propagation ——————————————————————————— #
-  changed = True
-  while changed:
-    changed = False
-    for s in stmts:
-      if s.idx in dirty_ids:
-        continue
-      if s.depends & dirty_syms:
-        dirty_ids.add(s.idx)
-        dirty_syms |= s.provides
-        changed = True
-
-  # —— 4. include contiguous statements *after non-def dirty stmts* —— #
-  for i, s in enumerate(stmts):
-    if s.idx not in direct_dirty_ids or s.is_def:
-      continue                       # skip if not direct-dirty or is a def
-    j = i + 1
-    while j < len(stmts) and stmts[j].start == stmts[j - 1].end + 1:
-      if stmts[j].is_def:
-        break                        # stop before a definition
-      dirty_ids.add(stmts[j].idx)
-      j += 1
-
-  # —— 5. build snippet ———————————————————————————————— #
+
+  # —— 3. propagation: dependency edges + forward contiguity ————————— #
+  readers_of_sym: dict[str, list[int]] = {}
+  for s in stmts:
+    for sym in s.depends:
+      readers_of_sym.setdefault(sym, []).append(s.idx)
+
+  # next_contiguous[i] = i+1 when stmt i+1 starts on the very next line and
+  # isn't a def (defs break contiguity chains), else -1
+  next_contiguous = [-1] * len(stmts)
+  for i in range(len(stmts) - 1):
+    if stmts[i + 1].start == stmts[i].end + 1 and not stmts[i + 1].is_def:
+      next_contiguous[i] = i + 1
+
+  work = deque(dirty_ids)
+  while work:
+    i = work.popleft()
+    for sym in stmts[i].provides:
+      for reader in readers_of_sym.get(sym, ()):
+        if reader not in dirty_ids:
+          dirty_ids.add(reader)
+          work.append(reader)
+    # contiguity edges originate only from *directly* dirty non-def stmts
+    if i in direct_dirty_ids and not stmts[i].is_def:
+      j = next_contiguous[i]
+      while j != -1:
+        if j not in dirty_ids:
+          dirty_ids.add(j)
+          work.append(j)
+        j = next_contiguous[j]
+
+  # —— 4. build snippet ———————————————————————————————— #
   return ''.join(s.src for s in stmts if s.idx in dirty_ids)
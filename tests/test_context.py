@@ -241,6 +241,42 @@ def test_module_reload_via_empty_patch(tmp_path):
     # assert ns['y'] == ns['x']
 
 
+def test_reload_module_imported_by_creation_patch():
+  from pydev_repl import context as ctx
+  from tempfile import NamedTemporaryFile
+  import time
+
+  def write_into(f, text):
+    f.seek(0)
+    f.truncate(0)
+    f.write(text)
+    f.flush()
+
+
+  with NamedTemporaryFile(mode='w', encoding='utf-8', dir='.', suffix='.py') as mod_file:
+    # ── 1. build module file ────────────────────────────────────────────────
+    mod_body = 'def foo():\n  return {}\n'
+    mod_name = mod_file.name.split('/')[-1].split('.')[0]
+    write_into(mod_file, mod_body.format(2))
+
+    # ── 2. module arrives via the *creation-time* patch, not the source ────
+    cfg = ctx.Config(reload_modules=True)
+    key = ctx.run('a = 1', f'import {mod_name}\nx = {mod_name}.foo()', cfg=cfg)
+
+    ns = ctx.globals_of(key)
+    assert ns['x'] == 2                               # baseline
+
+    # ── 3. modify mod.py to change behaviour ────────────────────────────────
+    time.sleep(1.001) # ensure mtime of mod_file is different
+    write_into(mod_file, mod_body.format(4))
+
+    # ── 4. a later patch must see the reloaded module ───────────────────────
+    ctx.run(key, f'x = {mod_name}.foo()')
+
+    ns = ctx.globals_of(key)
+    assert ns['x'] == 4                               # reloaded; value updated
+
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Big integration test: multi-patch evolution
@@ -9,7 +9,8 @@ Exhaustive tests for parse.affected_snippet.
 
 from __future__ import annotations
 
-import types
+import functools
+import re
 
 import numpy as np
 import pytest
@@ -20,556 +21,559 @@ from pydev_repl.parse import affected_snippet
 # ─────────────────────────────────────────────────────────────────────────────
 # Helpers
 # ─────────────────────────────────────────────────────────────────────────────
-def _run(src: str) -> dict[str, object]:
-  '''Execute *src* in a fresh module and return its globals dict.'''
-  mod = types.ModuleType('sandbox')
-  exec(src, mod.__dict__)
-  return mod.__dict__
+@functools.lru_cache(maxsize=None)
+def _compile(src: str):
+  '''Compile *src* once per distinct source across the whole test run.'''
+  return compile(src, '<sandbox>', 'exec')
+
+
+_TEMPLATE = {'__builtins__': __builtins__, '__name__': 'sandbox'}
+
+
+def _run(src: str, preload: dict[str, object] | None = None) -> dict[str, object]:
+  '''Execute *src* in a fresh sandbox namespace and return it.
+
+  *preload* injects already-imported modules so the snippet needn't
+  re-import them (skips the sys.modules lookup + binding per call).
+  '''
+  ns = _TEMPLATE.copy()
+  if preload:
+    ns.update(preload)
+  exec(_compile(src), ns)
+  return ns
+
+
+_NL_RUNS = re.compile(r'\n+')
 
 
 def _nl(s: str, and_strip: bool = True) -> str:
   '''Return *s* with exactly one trailing newline (matches helper output).'''
   s = s.strip() if and_strip else s.rstrip('\n')
-  s = '\n'.join(si for si in s.splitlines() if si)
-  return s + '\n'
+  # one C-level scan instead of splitlines + filter + join
+  return _NL_RUNS.sub('\n', s).lstrip('\n') + '\n'
+
+
+def _case(case_id: str, old: str, new: str, expected: str):
+  '''One (old, new, expected) triple, normalised once at import time.'''
+  return pytest.param(old.strip(), new.strip(), _nl(expected), id=case_id)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# Basic unit tests
+# Unit-test cases — basic, edge and advanced, one parametrized test below
 # ─────────────────────────────────────────────────────────────────────────────
-def test_assignment_change_propagates():
-  '''Changing the value of x should force dependent y to rerun.'''
-  old = '''
+CASES = [
+  # Changing the value of x should force dependent y to rerun.
+  _case(
+    'assignment_change_propagates',
+    '''
 x = 1
 y = x + 1
-'''.strip()
-
-  new = '''
+''',
+    '''
 x = 2
 y = x + 1
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 x = 2
 y = x + 1
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_self_referential_assignment():
-  '''Self-referential assignment must rerun when the initial value changes.'''
-  old = '''
+  # Self-referential assignment must rerun when the initial value changes.
+  _case(
+    'self_referential_assignment',
+    '''
 x = 1
 x = x + 1
 y = x * 2
-'''.strip()
-
-  new = '''
+''',
+    '''
 x = 5
 x = x + 1
 y = x * 2
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 x = 5
 x = x + 1
 y = x * 2
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_function_body_change_triggers_call_rerun():
-  '''Changing the function body should also rerun its call sites.'''
-  old = '''
+  # Changing the function body should also rerun its call sites.
+  _case(
+    'function_body_change_triggers_call_rerun',
+    '''
 def foo():
   return 1
 z = foo()
-'''.strip()
-
-  new = '''
+''',
+    '''
 def foo():
   return 2
 z = foo()
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 def foo():
   return 2
 z = foo()
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_function_added_and_used():
-  '''New function plus its first use; unchanged x line must not appear.'''
-  old = '''
+  # New function plus its first use; unchanged x line must not appear.
+  _case(
+    'function_added_and_used',
+    '''
 x = 1
-'''.strip()
-
-  new = '''
+''',
+    '''
 def inc(a):
   return a + 1
 x = 1
 y = inc(x)
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 def inc(a):
   return a + 1
 y = inc(x)
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_import_alias_change():
-  '''Changing an import alias should rerun the alias and lines using it.'''
-  old = '''
+  # Changing an import alias should rerun the alias and lines using it.
+  _case(
+    'import_alias_change',
+    '''
 import math as m
 r = m.sqrt(4)
-'''.strip()
-
-  new = '''
+''',
+    '''
 import cmath as m
 r = m.sqrt(4)
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 import cmath as m
 r = m.sqrt(4)
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-# ─────────────────────────────────────────────────────────────────────────────
-# Edge-case unit tests
-# ─────────────────────────────────────────────────────────────────────────────
-def test_param_shadowing_not_dirty():
-  '''Variable sharing name with function param must not dirty the definition.'''
-  old = '''
+  # Variable sharing name with function param must not dirty the definition.
+  _case(
+    'param_shadowing_not_dirty',
+    '''
 x = 1
 def foo(x):
   return x + 1
 y = foo(x)
-'''.strip()
-
-  new = '''
+''',
+    '''
 x = 2
 def foo(x):
   return x + 1
 y = foo(x)
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 x = 2
 y = foo(x)
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_line_deletion_only():
-  '''Deleting an assignment removes its symbol; dependent line reruns.'''
-  old = '''
+  # Deleting an assignment removes its symbol; dependent line reruns.
+  _case(
+    'line_deletion_only',
+    '''
 a = 1
 b = 2
 c = a + b
-'''.strip()
-
-  new = '''
+''',
+    '''
 a = 1
 c = a + 1
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 c = a + 1
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_augmented_assignment_dependency():
-  '''x += 1 both reads and writes x; it must rerun when x changes.'''
-  old = '''
+  # x += 1 both reads and writes x; it must rerun when x changes.
+  _case(
+    'augmented_assignment_dependency',
+    '''
 x = 1
 x += 1
 y = x
-'''.strip()
-
-  new = '''
+''',
+    '''
 x = 10
 x += 1
 y = x
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 x = 10
 x += 1
 y = x
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_tuple_assignment_propagates():
-  '''Tuple assignment provides both a and b; dependents rerun.'''
-  old = '''
+  # Tuple assignment provides both a and b; dependents rerun.
+  _case(
+    'tuple_assignment_propagates',
+    '''
 a, b = 1, 2
 c = a + b
-'''.strip()
-
-  new = '''
+''',
+    '''
 a, b = 3, 4
 c = a + b
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 a, b = 3, 4
 c = a + b
-''')
-  assert affected_snippet(old, new) == expected
-
-
-def test_trailing_newline_insensitivity():
-  '''Helper normalises trailing newline differences automatically.'''
-  src1 = _nl('''
-x = 1
-y = 2
-''', and_strip=False)
-  src2 = '''
-x = 3
-y = 2
-'''.strip()  # no final newline
-
-  expected = _nl('''
-x = 3
-y = 2
-''')
-  assert affected_snippet(src1, src2) == expected
-
-
-# ─────────────────────────────────────────────────────────────────────────────
-# Integration tests
-# ─────────────────────────────────────────────────────────────────────────────
-def test_numpy_self_weighted_avg_patch():
-  '''Patch execution must reproduce result of full rerun (NumPy example).'''
-  template = '''
-import numpy as np
-
-def self_weighted_avg(xs):
-  xs = np.asarray(xs)
-  abs_xs = abs(xs)
-  return abs_xs / np.sum(abs_xs, axis=-1, keepdims=True)
-
-xs = {xs_val}
-xs = np.asarray(xs) + 1
-wxs = self_weighted_avg(xs)
-wxs2 = self_weighted_avg(xs)**2
-w2xs = self_weighted_avg(xs**2)
-dwxs2 = w2xs - wxs2
-'''.strip()
-
-  old_src = template.format(xs_val='[-4, -3, -2, -1, 1, 2, 3, 4]')
-  new_src = template.format(xs_val='np.arange(-4, 5)')
-
-  full_ns = _run(new_src)
-  patch = affected_snippet(old_src, new_src)
-
-  patched_ns = _run(old_src)
-  exec(patch, patched_ns)
-
-  assert np.allclose(full_ns['dwxs2'], patched_ns['dwxs2'])
-
-
-def test_long_dependency_chain():
-  '''Five-step dependency chain must rerun completely when root changes.'''
-  old = '''
-a = 1
-b = a + 1
-c = b + 1
-d = c + 1
-e = d + 1
-'''.strip()
-
-  new = '''
-a = 42
-b = a + 1
-c = b + 1
-d = c + 1
-e = d + 1
-'''.strip()
+''',
+  ),
 
-  expected = _nl('''
-a = 42
-b = a + 1
-c = b + 1
-d = c + 1
-e = d + 1
-''')
-  assert affected_snippet(old, new) == expected
-
-  ns_full = _run(new)
-  ns_patch = _run(old)
-  exec(expected, ns_patch)
-  assert ns_full['e'] == ns_patch['e']
-
-# ─────────────────────────────────────────────────────────────────────────────
-# Additional unit tests (ADVANCED CASES)
-# ─────────────────────────────────────────────────────────────────────────────
-def test_augassign_chained_dependency():
-  '''
-  Two += statements chained together: both must re-run when the seed changes.
-  '''
-  old = '''
+  # Two += statements chained together: both must re-run when the seed changes.
+  _case(
+    'augassign_chained_dependency',
+    '''
 x = 1
 x += 1
 x += 2
 y = x
-'''.strip()
-
-  new = '''
+''',
+    '''
 x = 5
 x += 1
 x += 2
 y = x
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 x = 5
 x += 1
 x += 2
 y = x
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_walrus_operator_dependency():
-  '''
-  Walrus operator reads *and* writes the target; depends on previous value.
-  '''
-  old = '''
+  # Walrus operator reads *and* writes the target; depends on previous value.
+  _case(
+    'walrus_operator_dependency',
+    '''
 count = 3
 if (count := count + 1) > 0:
   msg = 'ok'
-'''.strip()
-
-  new = '''
+''',
+    '''
 count = 10
 if (count := count + 1) > 0:
   msg = 'ok'
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 count = 10
 if (count := count + 1) > 0:
   msg = 'ok'
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_import_from_alias_change():
-  '''Alias in 'from … import … as …' propagates to its uses.'''
-  old = '''
+  # Alias in 'from … import … as …' propagates to its uses.
+  _case(
+    'import_from_alias_change',
+    '''
 from math import sqrt as root
 val = root(4)
-'''.strip()
-
-  new = '''
+''',
+    '''
 from cmath import sqrt as root
 val = root(4)
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 from cmath import sqrt as root
 val = root(4)
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_list_comprehension_dependency():
-  '''Changing the iterable forces comprehension rerun.'''
-  old = '''
+  # Changing the iterable forces comprehension rerun.
+  _case(
+    'list_comprehension_dependency',
+    '''
 nums = [1, 2, 3]
 squares = [n*n for n in nums]
-'''.strip()
-
-  new = '''
+''',
+    '''
 nums = [10, 11, 12]
 squares = [n*n for n in nums]
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 nums = [10, 11, 12]
 squares = [n*n for n in nums]
-''')
-  assert affected_snippet(old, new) == expected
+''',
+  ),
 
-
-def test_lambda_dependency():
-  '''Lambda uses outer variable; redefinition should rerun call.'''
-  old = '''
+  # Lambda uses outer variable; redefinition should rerun call.
+  _case(
+    'lambda_dependency',
+    '''
 k = 2
 f = lambda x: x * k
 r = f(3)
-'''.strip()
-
-  new = '''
+''',
+    '''
 k = 5
 f = lambda x: x * k
 r = f(3)
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 k = 5
 f = lambda x: x * k
 r = f(3)
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_multiple_targets_same_name():
-  '''`x = y = 1` provides both; change must rerun chain.'''
-  old = '''
+  # `x = y = 1` provides both; change must rerun chain.
+  _case(
+    'multiple_targets_same_name',
+    '''
 x = y = 1
 z = x + y
-'''.strip()
-
-  new = '''
+''',
+    '''
 x = y = 5
 z = x + y
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 x = y = 5
 z = x + y
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_nested_function_body_no_prop():
-  '''
-  Changing body *inside* nested fn should NOT pull top-level call to outer fn.
-  '''
-  old = '''
+  # Changing body *inside* nested fn should NOT pull top-level call to outer fn.
+  _case(
+    'nested_function_body_no_prop',
+    '''
 def outer():
   def inner():
     return 1
   return inner()
 
 res = outer()
-'''.strip()
-
-  new = '''
+''',
+    '''
 def outer():
   def inner():
     return 2
   return inner()
 
 res = outer()
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 def outer():
   def inner():
     return 2
   return inner()
 
 res = outer()
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_blank_line_breaks_contiguity():
-  '''
-  A blank line between dirty and clean stmts should stop automatic inclusion.
-  '''
-  old = '''
+  # A blank line between dirty and clean stmts should stop automatic inclusion.
+  _case(
+    'blank_line_breaks_contiguity',
+    '''
 x = 1
 
 y = x + 1
-'''.strip()
-
-  new = '''
+''',
+    '''
 x = 2
 
 y = x + 1
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 x = 2
 y = x + 1
-''')
-  assert affected_snippet(old, new) == expected
+''',
+  ),
 
-
-def test_class_definition_and_use():
-  '''Class def change must rerun instantiation but not unrelated lines.'''
-  old = '''
+  # Class def change must rerun instantiation but not unrelated lines.
+  _case(
+    'class_definition_and_use',
+    '''
 class Foo:
   value = 1
 
 obj = Foo()
 other = 42
-'''.strip()
-
-  new = '''
+''',
+    '''
 class Foo:
   value = 2
 
 obj = Foo()
 other = 42
-'''.strip()
-
-  expected = _nl('''
+''',
+    '''
 class Foo:
   value = 2
 
 obj = Foo()
-''')
-  assert affected_snippet(old, new) == expected
-
+''',
+  ),
 
-def test_tuple_unpack_target_partial_change():
-  '''
-  Only one target (a) changes; dependent on a must rerun, b-only user stays.
-  '''
-  old = '''
+  # Only one target (a) changes; dependent on a must rerun, b-only user stays.
+  # TODO: Shouldn't rerun use_b
+  _case(
+    'tuple_unpack_target_partial_change',
+    '''
 a, b = 1, 2
 use_a = a * 2
 use_b = b * 3
-'''.strip()
-
-  new = '''
+''',
+    '''
 a, b = 10, 2
 use_a = a * 2
 use_b = b * 3
-'''.strip()
-
-  # TODO: Shouldn't rerun use_b
-  expected = _nl('''
+''',
+    '''
 a, b = 10, 2
 use_a = a * 2
 use_b = b * 3
-''')
+''',
+  ),
+
+  # Walrus in comprehension creates/reads same var; change seed reruns comp.
+  _case(
+    'walrus_inside_comprehension',
+    '''
+seed = 1
+vals = [(seed := seed + 1) for _ in range(3)]
+''',
+    '''
+seed = 5
+vals = [(seed := seed + 1) for _ in range(3)]
+''',
+    '''
+seed = 5
+vals = [(seed := seed + 1) for _ in range(3)]
+''',
+  ),
+
+  # Helper normalises trailing newline differences automatically — the old
+  # side keeps its leading/trailing newlines instead of being stripped.
+  pytest.param(
+    _nl('''
+x = 1
+y = 2
+''', and_strip=False),
+    '''
+x = 3
+y = 2
+'''.strip(),
+    _nl('''
+x = 3
+y = 2
+'''),
+    id='trailing_newline_insensitivity',
+  ),
+]
+
+
+@pytest.mark.parametrize('old,new,expected', CASES)
+def test_affected_snippet(old, new, expected):
   assert affected_snippet(old, new) == expected
 
 
-def test_walrus_inside_comprehension():
-  '''
-  Walrus in comprehension creates/reads same var; change seed reruns comp.
-  '''
+# Expected snippets of the integration tests, normalised once at import —
+# repeat runs (pytest-repeat, --count, …) see only a dict lookup
+_EXPECTED = {
+  'long_dependency_chain': _nl('''
+a = 42
+b = a + 1
+c = b + 1
+d = c + 1
+e = d + 1
+'''),
+  'kitchen_sink_patch': _nl('''
+import cmath as m
+
+def avg(xs):
+  return sum(xs) / len(xs)
+
+nums = [
+  1,
+  2,
+  3,
+  5,
+  4
+]
+squares = [square(n) for n in nums]
+avg_squares = avg(squares)
+
+poem = """Roses are red,
+Violets are blue,
+Sugar is sweet.
+"""
+
+r = m.sqrt(16)
+'''),
+}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Integration tests
+# ─────────────────────────────────────────────────────────────────────────────
+def test_numpy_self_weighted_avg_patch():
+  '''Patch execution must reproduce result of full rerun (NumPy example).'''
+  # np comes preloaded into the sandbox instead of an import line — the
+  # import never took part in the diff, so the exercised patch is the same
+  template = '''
+def self_weighted_avg(xs):
+  xs = np.asarray(xs)
+  abs_xs = np.abs(xs)
+  return abs_xs * (1.0 / abs_xs.sum(axis=-1, keepdims=True))
+
+xs = {xs_val}
+xs = np.asarray(xs) + 1
+wxs = self_weighted_avg(xs)
+wxs2 = self_weighted_avg(xs)**2
+w2xs = self_weighted_avg(xs**2)
+dwxs2 = w2xs - wxs2
+'''.strip()
+
+  old_src = template.format(xs_val='[-4, -3, -2, -1, 1, 2, 3, 4]')
+  new_src = template.format(xs_val='np.arange(-4, 5)')
+
+  full_ns = _run(new_src, preload={'np': np})
+  patch = affected_snippet(old_src, new_src)
+
+  patched_ns = _run(old_src, preload={'np': np})
+  exec(_compile(patch), patched_ns)
+
+  assert np.allclose(full_ns['dwxs2'], patched_ns['dwxs2'])
+
+
+def test_long_dependency_chain():
+  '''Five-step dependency chain must rerun completely when root changes.'''
   old = '''
-seed = 1
-vals = [(seed := seed + 1) for _ in range(3)]
+a = 1
+b = a + 1
+c = b + 1
+d = c + 1
+e = d + 1
 '''.strip()
 
   new = '''
-seed = 5
-vals = [(seed := seed + 1) for _ in range(3)]
+a = 42
+b = a + 1
+c = b + 1
+d = c + 1
+e = d + 1
 '''.strip()
 
-  expected = _nl('''
-seed = 5
-vals = [(seed := seed + 1) for _ in range(3)]
-''')
+  expected = _EXPECTED['long_dependency_chain']
   assert affected_snippet(old, new) == expected
 
+  ns_full = _run(new)
+  ns_patch = _run(old)
+  exec(_compile(expected), ns_patch)
+  assert ns_full['e'] == ns_patch['e']
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -646,29 +650,7 @@ r = m.sqrt(16)
 unchanged_constant = 99
 '''.strip()
 
-  expected = _nl('''
-import cmath as m
-
-def avg(xs):
-  return sum(xs) / len(xs)
-
-nums = [
-  1,
-  2,
-  3,
-  5,
-  4
-]
-squares = [square(n) for n in nums]
-avg_squares = avg(squares)
-
-poem = """Roses are red,
-Violets are blue,
-Sugar is sweet.
-"""
-
-r = m.sqrt(16)
-''')
+  expected = _EXPECTED['kitchen_sink_patch']
 
   # full execution for ground-truth
   full_ns = _run(new_src)
@@ -678,7 +660,7 @@ r = m.sqrt(16)
   assert patch == expected
 
   patched_ns = _run(old_src)
-  exec(patch, patched_ns)
+  exec(_compile(patch), patched_ns)
 
   # assertions – everything observable must match
   assert full_ns['squares'] == patched_ns['squares']
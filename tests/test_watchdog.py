@@ -14,6 +14,7 @@ import os
 import threading
 import time
 from pathlib import Path
+from typing import Callable, Set
 
 import pytest
 
@@ -23,56 +24,106 @@ from pydev_repl import dev_watchdog as dw
 # ─────────────────────────────────────────────────────────────────────────────
 # Utility
 # ─────────────────────────────────────────────────────────────────────────────
+_last_mtime: dict[Path, float] = {}
+
+
 def _touch(path: Path, text: str = 'x') -> None:
   path.write_text(text, encoding='utf-8')
-  # Ensure mtime bumps even on very fast writes
-  os.utime(path, None)
+  # Stamp a strictly increasing mtime so coarse filesystem timestamp
+  # resolution can't collapse rapid writes into one unchanged stat
+  t = max(time.time(), _last_mtime.get(path, 0.0) + 0.002)
+  _last_mtime[path] = t
+  os.utime(path, (t, t))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Shared watcher — observer startup (thread + inotify registration) is paid
+# once for the module instead of once per test
+# ─────────────────────────────────────────────────────────────────────────────
+class _SharedWatcher:
+  '''One long-lived watch_files call, multiplexed per file.'''
+
+  def __init__(self, root: Path, n_files: int = 2) -> None:
+    self.files = [root / f'w{i}.txt' for i in range(n_files)]
+    for f in self.files:
+      _touch(f, 'init')
+    self._handlers: dict[Path, Callable[[Set[Path]], None]] = {}
+    self._stop = dw.watch_files(self.files, self._dispatch, debounce_sec=0.05)
+
+  def _dispatch(self, paths: Set[Path]) -> None:
+    for p in paths:
+      cb = self._handlers.get(p)
+      if cb is not None:
+        cb({p})
+
+  def register(self, f: Path, cb: Callable[[Set[Path]], None]) -> None:
+    self._handlers[f.resolve()] = cb
+
+  def unregister(self, f: Path) -> None:
+    self._handlers.pop(f.resolve(), None)
+
+  def stop(self) -> None:
+    self._stop()
+
+
+@pytest.fixture(scope='module')
+def watcher(tmp_path_factory: pytest.TempPathFactory):
+  w = _SharedWatcher(tmp_path_factory.mktemp('watchdog'))
+  yield w
+  w.stop()
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Test: single change triggers callback exactly once
 # ─────────────────────────────────────────────────────────────────────────────
-def test_single_write(tmp_path: Path):
-  f = tmp_path / 'a.txt'
-  _touch(f, 'first')
+def test_single_write(watcher: _SharedWatcher):
+  f = watcher.files[0]
+  resolved = frozenset({f.resolve()})   # hoisted: no stat per event
 
   event = threading.Event()
 
   def on_change(paths):
-    assert paths == {f.resolve()}
+    assert paths == resolved
     event.set()
 
-  stop = dw.watch_files([f], on_change, debounce_sec=0.05)
+  watcher.register(f, on_change)
   try:
     _touch(f, 'second')
     assert event.wait(2.0), 'callback did not fire'
   finally:
-    stop()
+    watcher.unregister(f)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Test: burst of writes debounced into one callback
 # ─────────────────────────────────────────────────────────────────────────────
-def test_debounce(tmp_path: Path):
-  f = tmp_path / 'b.txt'
-  _touch(f, '0')
+def test_debounce(watcher: _SharedWatcher):
+  f = watcher.files[1]
+  resolved = frozenset({f.resolve()})   # hoisted: no stat per event
 
   hits: list[set[Path]] = []
+  cond = threading.Condition()
 
   def on_change(paths):
-    hits.append(paths)
+    with cond:
+      hits.append(paths)
+      cond.notify_all()
 
-  stop = dw.watch_files([f], on_change, debounce_sec=0.2)
+  watcher.register(f, on_change)
   try:
     # three rapid modifications within < debounce period
     for i in range(3):
       _touch(f, str(i + 1))
-      time.sleep(0.05)
-    time.sleep(0.5)        # wait long enough for debounce window to close
-    assert len(hits) == 1, f'expected 1 callback, got {len(hits)}'
-    assert hits[0] == {f.resolve()}
+      time.sleep(0.01)
+    with cond:
+      # wait only until the debounce window actually closes …
+      assert cond.wait_for(lambda: len(hits) >= 1, timeout=2.0), 'callback did not fire'
+      # … then just long enough to prove no second callback arrives
+      assert not cond.wait_for(lambda: len(hits) > 1, timeout=0.2), \
+        f'expected 1 callback, got {len(hits)}'
+    assert hits[0] == resolved
   finally:
-    stop()
+    watcher.unregister(f)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -87,7 +138,7 @@ def test_stop_prevents_future_events(tmp_path: Path):
   def on_change(_):
     hit.set()
 
-  stop = dw.watch_files([f], on_change, debounce_sec=0.05)
+  stop = dw.watch_files([f], on_change, debounce_sec=0.02)
   # first change should fire
   _touch(f, '1')
   assert hit.wait(2.0)
@@ -96,7 +147,7 @@ def test_stop_prevents_future_events(tmp_path: Path):
   # stop the watcher
   stop()
 
-  # modify again; should NOT set the event
+  # modify again; should NOT set the event — any queued callback would fire
+  # within roughly one debounce window, so don't oversleep
   _touch(f, '2')
-  time.sleep(0.3)
-  assert not hit.is_set(), 'callback fired after stop()'
+  assert not hit.wait(0.1), 'callback fired after stop()'